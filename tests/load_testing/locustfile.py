@@ -44,6 +44,7 @@ import logging
 import os
 import random
 
+import gevent
 from config import CacheMode, get_settings
 from locust import between, events, HttpUser, task
 from locust.runners import MasterRunner, WorkerRunner
@@ -81,10 +82,37 @@ def on_locust_init(environment, **kwargs):
     logger.info(f"Target: {settings.superset.base_url}")
 
 
+# Greenlet scheduling periodic metrics snapshots while a test runs
+_export_loop: gevent.Greenlet | None = None
+
+
+def _periodic_export(interval: float) -> None:
+    collector = get_metrics_collector()
+    while True:
+        gevent.sleep(interval)
+        if not collector.schedule_export("metrics_latest.json"):
+            logger.debug("Previous metrics export still pending, skipping")
+
+
+@events.test_start.add_listener
+def on_test_start(environment, **kwargs):
+    """Start periodic background metrics exports."""
+    global _export_loop
+    interval = settings.metrics.export_interval_seconds
+    if settings.metrics.export_to_json and interval > 0 and _export_loop is None:
+        _export_loop = gevent.spawn(_periodic_export, interval)
+
+
 @events.test_stop.add_listener
 def on_test_stop(environment, **kwargs):
     """Export metrics when test stops."""
+    global _export_loop
+    if _export_loop is not None:
+        _export_loop.kill()
+        _export_loop = None
+
     collector = get_metrics_collector()
+    collector.wait_for_exports()
     report = collector.get_report()
 
     logger.info("=" * 60)
@@ -165,7 +193,8 @@ class SupersetUser(HttpUser):
 
     def on_stop(self):
         """Called when a simulated user stops."""
-        pass
+        if self.sqllab:
+            self.sqllab.flush_db_query_times()
 
     def should_use_cache(self) -> bool:
         """Determine if this request should use cache based on cache mode."""
@@ -70,7 +70,7 @@ class ChartScenarios:
         if not self._chart_cache:
             self._refresh_chart_cache()
         if self._chart_cache:
-            return random_choice(self._chart_cache)
+            return random_choice(self._chart_cache, self.client.rng)
         return None
 
     def _get_random_dataset(self) -> dict | None:
@@ -78,7 +78,7 @@ class ChartScenarios:
         if not self._dataset_cache:
             self._refresh_dataset_cache()
         if self._dataset_cache:
-            return random_choice(self._dataset_cache)
+            return random_choice(self._dataset_cache, self.client.rng)
         return None
 
     def list_charts(
@@ -22,6 +22,7 @@ Dashboard scenarios for load testing.
 import json
 import logging
 import time
+from functools import partial
 from typing import Any, TYPE_CHECKING
 
 from ..utils.helpers import random_choice, random_string
@@ -53,7 +54,7 @@ class DashboardScenarios:
         if not self._dashboard_cache:
             self._refresh_dashboard_cache()
         if self._dashboard_cache:
-            return random_choice(self._dashboard_cache).get("id")
+            return random_choice(self._dashboard_cache, self.client.rng).get("id")
         return None
 
     def list_dashboards(
@@ -115,15 +116,18 @@ class DashboardScenarios:
             logger.warning("No dashboard available to view")
             return None, []
 
-        # Get dashboard
+        # Dashboard metadata and its chart list are independent, fetch both at once
         with MetricsTimer("dashboard.view_full"):
-            dashboard = self.client.get_dashboard(dashboard_id)
+            dashboard, charts_result = self.client.fanout(
+                [
+                    partial(self.client.get_dashboard, dashboard_id),
+                    partial(self.client.get_dashboard_charts, dashboard_id),
+                ]
+            )
 
         if not dashboard:
             return None, []
 
-        # Get charts for dashboard
-        charts_result = self.client.get_dashboard_charts(dashboard_id)
         charts = []
 
         if charts_result and "result" in charts_result:
@@ -53,7 +53,7 @@ class DatabaseScenarios:
         if not self._database_cache:
             self._refresh_database_cache()
         if self._database_cache:
-            return random_choice(self._database_cache)
+            return random_choice(self._database_cache, self.client.rng)
         return None
 
     def list_databases(self, page: int = 0, page_size: int = 25) -> dict | None:
@@ -122,7 +122,7 @@ class DatabaseScenarios:
                 self.get_schemas(database_id)
                 schemas = self._schema_cache.get(database_id, [])
             if schemas:
-                schema = random_choice(schemas)
+                schema = random_choice(schemas, self.client.rng)
             else:
                 schema = "public"
 
@@ -162,7 +162,7 @@ class DatabaseScenarios:
                 self.get_tables(database_id, schema)
                 tables = self._table_cache.get(cache_key, [])
             if tables:
-                table = random_choice(tables)
+                table = random_choice(tables, self.client.rng)
                 table_name = table.get("value") if isinstance(table, dict) else table
             else:
                 return None
@@ -51,7 +51,7 @@ class DatasetScenarios:
         if not self._dataset_cache:
             self._refresh_dataset_cache()
         if self._dataset_cache:
-            return random_choice(self._dataset_cache)
+            return random_choice(self._dataset_cache, self.client.rng)
         return None
 
     def list_datasets(
@@ -53,7 +53,7 @@ class ExploreScenarios:
         if not self._dataset_cache:
             self._refresh_dataset_cache()
         if self._dataset_cache:
-            return random_choice(self._dataset_cache)
+            return random_choice(self._dataset_cache, self.client.rng)
         return None
 
     def get_form_data(self, key: str) -> dict | None:
@@ -32,6 +32,19 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# (endpoint, request name) pairs hit by the API stress test
+_STRESS_ENDPOINTS = [
+    (endpoint, f"GET {endpoint}")
+    for endpoint in (
+        "/api/v1/dashboard/",
+        "/api/v1/chart/",
+        "/api/v1/dataset/",
+        "/api/v1/database/",
+        "/api/v1/query/",
+        "/api/v1/saved_query/",
+    )
+]
+
 
 class MixedWorkflowScenarios:
     """
@@ -94,7 +107,7 @@ class MixedWorkflowScenarios:
 
             # Step 2: Open a dashboard
             if self._dashboard_ids:
-                dashboard_id = random_choice(self._dashboard_ids)
+                dashboard_id = random_choice(self._dashboard_ids, self.client.rng)
                 results["dashboard_view"] = self.client.get_dashboard(dashboard_id)
                 time.sleep(0.3)
 
@@ -149,7 +162,7 @@ class MixedWorkflowScenarios:
             time.sleep(0.3)
 
             if self._database_ids:
-                db_id = random_choice(self._database_ids)
+                db_id = random_choice(self._database_ids, self.client.rng)
 
                 # Step 2: Get schemas
                 results["schemas"] = self.client.get_database_schemas(db_id)
@@ -193,7 +206,7 @@ class MixedWorkflowScenarios:
             # Step 2: View 3 random dashboards
             if self._dashboard_ids:
                 for _ in range(min(3, len(self._dashboard_ids))):
-                    dashboard_id = random_choice(self._dashboard_ids)
+                    dashboard_id = random_choice(self._dashboard_ids, self.client.rng)
                     dashboard = self.client.get_dashboard(dashboard_id)
                     if dashboard:
                         results["dashboards_viewed"].append(dashboard)
@@ -211,7 +224,7 @@ class MixedWorkflowScenarios:
             # Step 4: View some charts
             if self._chart_ids:
                 for _ in range(min(5, len(self._chart_ids))):
-                    chart_id = random_choice(self._chart_ids)
+                    chart_id = random_choice(self._chart_ids, self.client.rng)
                     chart = self.client.get_chart(chart_id)
                     if chart:
                         results["charts_viewed"].append(chart)
@@ -237,7 +250,7 @@ class MixedWorkflowScenarios:
         with MetricsTimer("workflow.power_user"):
             # Step 1: Execute multiple SQL queries
             if self._database_ids:
-                db_id = random_choice(self._database_ids)
+                db_id = random_choice(self._database_ids, self.client.rng)
 
                 queries = [
                     "SELECT COUNT(*) FROM events",
@@ -256,7 +269,7 @@ class MixedWorkflowScenarios:
             # Step 2: Explore datasets
             if self._dataset_ids:
                 for _ in range(3):
-                    ds_id = random_choice(self._dataset_ids)
+                    ds_id = random_choice(self._dataset_ids, self.client.rng)
                     # Get samples
                     samples = self.client.post(
                         "/api/v1/datasource/samples",
@@ -290,7 +303,7 @@ class MixedWorkflowScenarios:
             if not self._dashboard_ids:
                 return results
 
-            dashboard_id = random_choice(self._dashboard_ids)
+            dashboard_id = random_choice(self._dashboard_ids, self.client.rng)
 
             # Get dashboard
             results["dashboard"] = self.client.get_dashboard(dashboard_id)
@@ -343,7 +356,7 @@ class MixedWorkflowScenarios:
             if not self._database_ids:
                 return results
 
-            db_id = random_choice(self._database_ids)
+            db_id = random_choice(self._database_ids, self.client.rng)
 
             # Sync queries
             sync_sqls = [
@@ -403,18 +416,9 @@ class MixedWorkflowScenarios:
         }
 
         with MetricsTimer("workflow.api_stress"):
-            endpoints = [
-                "/api/v1/dashboard/",
-                "/api/v1/chart/",
-                "/api/v1/dataset/",
-                "/api/v1/database/",
-                "/api/v1/query/",
-                "/api/v1/saved_query/",
-            ]
-
             for _ in range(20):
-                endpoint = random_choice(endpoints)
-                result = self.client.get(endpoint, name=f"GET {endpoint}")
+                endpoint, name = random_choice(_STRESS_ENDPOINTS, self.client.rng)
+                result = self.client.get(endpoint, name=name)
                 results["calls_made"] += 1
                 if result:
                     results["successful"] += 1
@@ -442,7 +446,7 @@ class MixedWorkflowScenarios:
             if not self._dataset_ids:
                 return results
 
-            ds_id = random_choice(self._dataset_ids)
+            ds_id = random_choice(self._dataset_ids, self.client.rng)
 
             query_context = {
                 "datasource": {"id": ds_id, "type": "table"},
@@ -20,18 +20,67 @@ SQL Lab scenarios for load testing.
 Critical for testing query execution performance.
 """
 
+import functools
+import itertools
 import logging
+import os
+import re
+import textwrap
 import time
-from typing import TYPE_CHECKING
+from collections import defaultdict, OrderedDict
+from dataclasses import dataclass
+from time import perf_counter
 
-from ..utils.helpers import random_choice, random_string, wait_for_async_query
-from ..utils.metrics import get_metrics_collector, MetricsTimer
+import gevent
 
-if TYPE_CHECKING:
-    from ..utils.api_client import SupersetAPIClient
+from ..utils.api_client import SupersetAPIClient
+from ..utils.helpers import (
+    fast_choice,
+    random_choice,
+    random_string,
+    wait_for_async_query,
+)
+from ..utils.metrics import get_metrics_collector, MetricsTimer, sampled_timer
 
 logger = logging.getLogger(__name__)
 
+# Fraction of execute_*_query calls that are timed (1.0 records every call)
+METRICS_SAMPLE_RATE = float(os.getenv("SQLLAB_METRICS_SAMPLE_RATE", "1.0"))
+
+# Seconds between bulk flushes of buffered database query times
+DB_TIMES_FLUSH_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class _DbContext:
+    """Per-database metric label dict and collector key, built once."""
+
+    label: dict[str, str]
+    key: str
+
+
+@functools.lru_cache(maxsize=128)
+def _db_ctx(database_id: int) -> _DbContext:
+    """Return the cached metrics context for a database."""
+    database = str(database_id)
+    return _DbContext(label={"database_id": database}, key=f"db_{database}")
+
+
+def _execution_time(result: dict) -> float | None:
+    """Extract the database execution time from a SQL Lab response."""
+    query = result.get("query")
+    return query.get("executionTime") if query else None
+
+
+def _normalize_query(query: str) -> str:
+    """Drop template indentation and surrounding blank lines."""
+    return textwrap.dedent(query).strip()
+
+
+def _to_percent_template(query: str) -> str:
+    """Convert a str.format query template to %-style mapping placeholders."""
+    return re.sub(r"\{(\w+)\}", r"%(\1)s", query.replace("%", "%%"))
+
 
 # Sample SQL queries for testing different complexity levels
 SIMPLE_QUERIES = [
@@ -157,30 +206,157 @@ HEAVY_QUERIES = [
     """,
 ]
 
+# Normalize once at import so whitespace is not sent with every request
+SIMPLE_QUERIES = [_normalize_query(query) for query in SIMPLE_QUERIES]
+MEDIUM_QUERIES = [_normalize_query(query) for query in MEDIUM_QUERIES]
+COMPLEX_QUERIES = [_normalize_query(query) for query in COMPLEX_QUERIES]
+HEAVY_QUERIES = [_normalize_query(query) for query in HEAVY_QUERIES]
+
+# Heavy queries pre-formatted with the default columns used by async scenarios
+_HEAVY_QUERIES_DEFAULT = [
+    query.format(
+        table="events",
+        column="event_type",
+        date_column="timestamp",
+        metric_column="value",
+    )
+    for query in HEAVY_QUERIES
+]
+
+# %-style template pool and metric name for each sync query complexity tier;
+# mapping interpolation is about twice as fast as str.format on these queries
+_QUERY_SPECS: dict[str, tuple[list[str], str]] = {
+    tier: ([_to_percent_template(query) for query in queries], metric_name)
+    for tier, queries, metric_name in (
+        ("simple", SIMPLE_QUERIES, "sqllab.execute_simple"),
+        ("medium", MEDIUM_QUERIES, "sqllab.execute_medium"),
+        ("complex", COMPLEX_QUERIES, "sqllab.execute_complex"),
+        ("heavy", HEAVY_QUERIES, "sqllab.execute_heavy"),
+    )
+}
+
 
 class SQLLabScenarios:
     """SQL Lab load testing scenarios."""
 
-    def __init__(self, client: "SupersetAPIClient"):
+    __slots__ = (
+        "client",
+        "metrics",
+        "_database_cache",
+        "_database_id_cache",
+        "_table_cache",
+        "_pending_db_times",
+        "_pending_flush_at",
+        "_enable_result_cache",
+        "_result_cache_size",
+        "_result_cache_ttl",
+        "_result_cache",
+        "_name_prefix",
+        "_name_counter",
+    )
+
+    def __init__(
+        self,
+        client: SupersetAPIClient,
+        enable_result_cache: bool = False,
+        result_cache_size: int = 256,
+        result_cache_ttl: float = 60.0,
+    ):
         self.client = client
         self.metrics = get_metrics_collector()
         self._database_cache: list[dict] = []
+        self._database_id_cache: list[int] = []
         self._table_cache: dict[int, list[str]] = {}
 
+        # Unique names for saved queries/CTAS tables: a 64-bit random prefix per
+        # instance, then a cheap counter per call
+        self._name_prefix = random_string(16)
+        self._name_counter = itertools.count()
+
+        # Database query times are buffered locally and flushed once per second
+        self._pending_db_times: dict[int, list[float]] = defaultdict(list)
+        self._pending_flush_at = time.monotonic() + DB_TIMES_FLUSH_INTERVAL
+
+        # Optional client-side cache of sync query results, disabled by default
+        # so that stress scenarios always reach the database
+        self._enable_result_cache = enable_result_cache
+        self._result_cache_size = result_cache_size
+        self._result_cache_ttl = result_cache_ttl
+        self._result_cache: OrderedDict[
+            tuple[int, str | None, str], tuple[float, dict]
+        ] = OrderedDict()
+
     def _refresh_database_cache(self) -> None:
         """Refresh local cache of databases."""
         result = self.client.get_databases(page_size=100)
         if result and "result" in result:
             self._database_cache = result["result"]
+            self._database_id_cache = [
+                db["id"] for db in self._database_cache if db.get("id") is not None
+            ]
 
-    def _get_random_database(self) -> dict | None:
-        """Get random database from cache."""
-        if not self._database_cache:
+    def _get_random_database_id(self) -> int | None:
+        """Get random database id from cache."""
+        if not self._database_id_cache:
             self._refresh_database_cache()
-        if self._database_cache:
-            return random_choice(self._database_cache)
+        if self._database_id_cache:
+            return random_choice(self._database_id_cache, self.client.rng)
+        return None
+
+    def _next_name_suffix(self) -> str:
+        """Return a name suffix unique to this scenario instance."""
+        return f"{self._name_prefix}_{next(self._name_counter):x}"
+
+    def _cached_result(
+        self, database_id: int, sql: str, schema: str | None = None
+    ) -> dict | None:
+        """Return a fresh result for a repeated statement from the result cache."""
+        if not self._enable_result_cache:
+            return None
+
+        key = (database_id, schema, sql)
+        cached = self._result_cache.get(key)
+        if cached is not None:
+            expires_at, cached_result = cached
+            if expires_at > time.monotonic():
+                self._result_cache.move_to_end(key)
+                self.metrics.increment("sqllab.result_cache.hits")
+                return cached_result
+            del self._result_cache[key]
+
+        self.metrics.increment("sqllab.result_cache.misses")
         return None
 
+    def _execute_with_cache(
+        self, database_id: int, sql: str, schema: str | None = None
+    ) -> dict | None:
+        """Execute sync query, storing the result when the result cache is on."""
+        result = self.client.execute_sql(
+            database_id=database_id, sql=sql, schema=schema, run_async=False
+        )
+        if result and self._enable_result_cache:
+            key = (database_id, schema, sql)
+            self._result_cache[key] = (
+                time.monotonic() + self._result_cache_ttl,
+                result,
+            )
+            if len(self._result_cache) > self._result_cache_size:
+                self._result_cache.popitem(last=False)
+        return result
+
+    def _record_db_query_time(self, database_id: int, query_time: float) -> None:
+        """Buffer a database query time, flushing the buffer when due."""
+        self._pending_db_times[database_id].append(query_time)
+        if time.monotonic() >= self._pending_flush_at:
+            self.flush_db_query_times()
+
+    def flush_db_query_times(self) -> None:
+        """Push buffered database query times to the metrics collector."""
+        pending, self._pending_db_times = self._pending_db_times, defaultdict(list)
+        self._pending_flush_at = time.monotonic() + DB_TIMES_FLUSH_INTERVAL
+        for database_id, query_times in pending.items():
+            self.metrics.record_db_query_times(_db_ctx(database_id).key, query_times)
+
     def get_bootstrap_data(self) -> dict | None:
         """
         Scenario: Get SQL Lab bootstrap data
@@ -189,39 +365,57 @@ class SQLLabScenarios:
         with MetricsTimer("sqllab.bootstrap"):
             return self.client.get("/api/v1/sqllab/", name="GET /api/v1/sqllab")
 
-    def execute_simple_query(
+    def _execute_tier(
         self,
+        tier: str,
         database_id: int | None = None,
         schema: str | None = None,
-        table: str = "events",
-        column: str = "id",
+        **format_kwargs: str,
     ) -> dict | None:
-        """
-        Scenario: Execute simple SQL query
-        Fast, lightweight query.
-        """
+        """Execute a random sync query from the given complexity tier."""
+        templates, metric_name = _QUERY_SPECS[tier]
+
         if database_id is None:
-            db = self._get_random_database()
-            database_id = db.get("id") if db else None
+            database_id = self._get_random_database_id()
 
         if database_id is None:
             return None
 
-        query_template = random_choice(SIMPLE_QUERIES)
-        sql = query_template.format(table=table, column=column)
+        sql = fast_choice(templates, self.client.rng) % format_kwargs
+        labels = _db_ctx(database_id).label
 
-        with MetricsTimer("sqllab.execute_simple", {"database_id": str(database_id)}):
-            result = self.client.execute_sql(
-                database_id=database_id, sql=sql, schema=schema, run_async=False
-            )
+        # Hits are counted by sqllab.result_cache.hits only: recording their
+        # latency or cached execution time would skew the database metrics
+        cached = self._cached_result(database_id, sql, schema)
+        if cached is not None:
+            return cached
 
-            if result:
-                # Track database query time if available
-                query_time = result.get("query", {}).get("executionTime")
-                if query_time:
-                    self.metrics.record_db_query_time(f"db_{database_id}", query_time)
+        with sampled_timer(metric_name, labels, METRICS_SAMPLE_RATE):
+            result = self._execute_with_cache(database_id, sql, schema)
 
-            return result
+        # Outside the timed block, so a buffer flush doesn't count as latency
+        if result:
+            # Track database query time if available
+            query_time = _execution_time(result)
+            if query_time:
+                self._record_db_query_time(database_id, query_time)
+
+        return result
+
+    def execute_simple_query(
+        self,
+        database_id: int | None = None,
+        schema: str | None = None,
+        table: str = "events",
+        column: str = "id",
+    ) -> dict | None:
+        """
+        Scenario: Execute simple SQL query
+        Fast, lightweight query.
+        """
+        return self._execute_tier(
+            "simple", database_id, schema, table=table, column=column
+        )
 
     def execute_medium_query(
         self,
@@ -236,33 +430,16 @@ class SQLLabScenarios:
         Scenario: Execute medium complexity query
         Includes GROUP BY and aggregations.
         """
-        if database_id is None:
-            db = self._get_random_database()
-            database_id = db.get("id") if db else None
-
-        if database_id is None:
-            return None
-
-        query_template = random_choice(MEDIUM_QUERIES)
-        sql = query_template.format(
+        return self._execute_tier(
+            "medium",
+            database_id,
+            schema,
             table=table,
             column=column,
             date_column=date_column,
             metric_column=metric_column,
         )
 
-        with MetricsTimer("sqllab.execute_medium", {"database_id": str(database_id)}):
-            result = self.client.execute_sql(
-                database_id=database_id, sql=sql, schema=schema, run_async=False
-            )
-
-            if result:
-                query_time = result.get("query", {}).get("executionTime")
-                if query_time:
-                    self.metrics.record_db_query_time(f"db_{database_id}", query_time)
-
-            return result
-
     def execute_complex_query(
         self,
         database_id: int | None = None,
@@ -276,33 +453,16 @@ class SQLLabScenarios:
         Scenario: Execute complex SQL query
         CTEs, window functions, subqueries.
         """
-        if database_id is None:
-            db = self._get_random_database()
-            database_id = db.get("id") if db else None
-
-        if database_id is None:
-            return None
-
-        query_template = random_choice(COMPLEX_QUERIES)
-        sql = query_template.format(
+        return self._execute_tier(
+            "complex",
+            database_id,
+            schema,
             table=table,
             column=column,
             date_column=date_column,
             metric_column=metric_column,
         )
 
-        with MetricsTimer("sqllab.execute_complex", {"database_id": str(database_id)}):
-            result = self.client.execute_sql(
-                database_id=database_id, sql=sql, schema=schema, run_async=False
-            )
-
-            if result:
-                query_time = result.get("query", {}).get("executionTime")
-                if query_time:
-                    self.metrics.record_db_query_time(f"db_{database_id}", query_time)
-
-            return result
-
     def execute_heavy_query(
         self,
         database_id: int | None = None,
@@ -316,33 +476,16 @@ class SQLLabScenarios:
         Scenario: Execute heavy analytical query
         Maximum complexity for stress testing.
         """
-        if database_id is None:
-            db = self._get_random_database()
-            database_id = db.get("id") if db else None
-
-        if database_id is None:
-            return None
-
-        query_template = random_choice(HEAVY_QUERIES)
-        sql = query_template.format(
+        return self._execute_tier(
+            "heavy",
+            database_id,
+            schema,
             table=table,
             column=column,
             date_column=date_column,
             metric_column=metric_column,
         )
 
-        with MetricsTimer("sqllab.execute_heavy", {"database_id": str(database_id)}):
-            result = self.client.execute_sql(
-                database_id=database_id, sql=sql, schema=schema, run_async=False
-            )
-
-            if result:
-                query_time = result.get("query", {}).get("executionTime")
-                if query_time:
-                    self.metrics.record_db_query_time(f"db_{database_id}", query_time)
-
-            return result
-
     def execute_async_query(
         self,
         database_id: int | None = None,
@@ -356,23 +499,17 @@ class SQLLabScenarios:
         Tests Celery worker performance.
         """
         if database_id is None:
-            db = self._get_random_database()
-            database_id = db.get("id") if db else None
+            database_id = self._get_random_database_id()
 
         if database_id is None:
             return None
 
         if sql is None:
             # Use a heavy query for async
-            sql = random_choice(HEAVY_QUERIES).format(
-                table="events",
-                column="event_type",
-                date_column="timestamp",
-                metric_column="value",
-            )
+            sql = fast_choice(_HEAVY_QUERIES_DEFAULT, self.client.rng)
 
         self.metrics.record_async_query_start()
-        start_time = time.time()
+        start_time = perf_counter()
 
         with MetricsTimer("sqllab.execute_async_start"):
             result = self.client.execute_sql(
@@ -382,7 +519,8 @@ class SQLLabScenarios:
         if not result:
             return None
 
-        query_id = result.get("query", {}).get("id")
+        query = result.get("query")
+        query_id = query.get("id") if query else None
         if not query_id:
             return result
 
@@ -399,9 +537,11 @@ class SQLLabScenarios:
                 max_attempts=max_wait_seconds * 2,
                 poll_interval=0.5,
                 timeout=max_wait_seconds,
+                initial_interval=0.1,
+                max_interval=2.0,
             )
 
-            total_time = (time.time() - start_time) * 1000
+            total_time = (perf_counter() - start_time) * 1000
             self.metrics.record_async_query_complete(total_time)
 
             return final_result
@@ -426,8 +566,7 @@ class SQLLabScenarios:
         Tests query planning without execution.
         """
         if database_id is None:
-            db = self._get_random_database()
-            database_id = db.get("id") if db else None
+            database_id = self._get_random_database_id()
 
         if database_id is None:
             return None
@@ -435,17 +574,11 @@ class SQLLabScenarios:
         if sql is None:
             sql = "SELECT * FROM events LIMIT 1000"
 
-        payload = {
-            "database_id": database_id,
-            "sql": sql,
-            "schema": schema,
-        }
-
         with MetricsTimer("sqllab.estimate_cost"):
             return self.client.post(
                 "/api/v1/sqllab/estimate/",
                 name="POST /api/v1/sqllab/estimate",
-                json_data=payload,
+                json_data={"database_id": database_id, "sql": sql, "schema": schema},
             )
 
     def format_sql(self, sql: str) -> dict | None:
@@ -453,13 +586,11 @@ class SQLLabScenarios:
         Scenario: Format SQL query
         Tests SQL formatting service.
         """
-        payload = {"sql": sql}
-
         with MetricsTimer("sqllab.format_sql"):
             return self.client.post(
                 "/api/v1/sqllab/format_sql/",
                 name="POST /api/v1/sqllab/format_sql",
-                json_data=payload,
+                json_data={"sql": sql},
             )
 
     def export_query_results(self, client_id: str, database_id: int) -> bytes | None:
@@ -498,7 +629,7 @@ class SQLLabScenarios:
         Scenario: Save query for later use
         """
         if label is None:
-            label = f"Load Test Query {random_string(8)}"
+            label = f"Load Test Query {self._next_name_suffix()}"
 
         payload = {
             "db_id": database_id,
@@ -518,11 +649,11 @@ class SQLLabScenarios:
         """
         Scenario: Stop running query
         """
-        payload = {"client_id": client_id}
-
         with MetricsTimer("sqllab.stop_query"):
             return self.client.post(
-                "/api/v1/query/stop", name="POST /api/v1/query/stop", json_data=payload
+                "/api/v1/query/stop",
+                name="POST /api/v1/query/stop",
+                json_data={"client_id": client_id},
             )
 
     def validate_sql(
@@ -531,17 +662,11 @@ class SQLLabScenarios:
         """
         Scenario: Validate SQL syntax
         """
-        payload = {
-            "database_id": database_id,
-            "sql": sql,
-            "schema": schema,
-        }
-
         with MetricsTimer("sqllab.validate_sql"):
             return self.client.post(
                 "/api/v1/database/validate_sql/",
                 name="POST /api/v1/database/validate_sql",
-                json_data=payload,
+                json_data={"database_id": database_id, "sql": sql, "schema": schema},
             )
 
     def create_table_as(
@@ -556,7 +681,7 @@ class SQLLabScenarios:
         Tests materialization capabilities.
         """
         if table_name is None:
-            table_name = f"load_test_ctas_{random_string(8)}"
+            table_name = f"load_test_ctas_{self._next_name_suffix()}"
 
         with MetricsTimer("sqllab.ctas"):
             return self.client.execute_sql(
@@ -576,14 +701,22 @@ class SQLLabScenarios:
         Scenario: Execute multiple concurrent queries
         Tests connection pool and concurrency handling.
         """
-        results = []
-
-        for i in range(num_queries):
-            sql = f"SELECT {i}, COUNT(*) FROM events GROUP BY 1"
-            result = self.client.execute_sql(
-                database_id=database_id, sql=sql, schema=schema, run_async=True
+        # Locust runs users on gevent, so greenlets give real request overlap
+        # without blocking other users the way an event loop would
+        greenlets = [
+            gevent.spawn(
+                self.client.execute_sql,
+                database_id=database_id,
+                sql=f"SELECT {i}, COUNT(*) FROM events GROUP BY 1",
+                schema=schema,
+                run_async=True,
             )
-            if result:
-                results.append(result)
-
-        return results
+            for i in range(num_queries)
+        ]
+        # Let every query finish before surfacing the first failure
+        gevent.joinall(greenlets)
+        for greenlet in greenlets:
+            if greenlet.exception is not None:
+                raise greenlet.exception
+
+        return [greenlet.value for greenlet in greenlets if greenlet.value]
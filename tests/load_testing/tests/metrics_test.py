@@ -0,0 +1,178 @@
+# Licensed to the Apache Software Foundation (ASF) under one
+# or more contributor license agreements.  See the NOTICE file
+# distributed with this work for additional information
+# regarding copyright ownership.  The ASF licenses this file
+# to you under the Apache License, Version 2.0 (the
+# "License"); you may not use this file except in compliance
+# with the License.  You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied.  See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+import math
+import random
+
+import pytest
+from utils.helpers import loads_json
+from utils.metrics import (
+    _HotColdCounter,
+    _MetricSeries,
+    _PCT_FRACS,
+    MetricsCollector,
+    MetricsTimer,
+)
+
+
+def _values(series: _MetricSeries) -> list[float]:
+    return [row[1] for row in series.rows([])]
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_percentiles_within_one_percent(seed: int) -> None:
+    rng = random.Random(seed)  # noqa: S311
+    values = [rng.lognormvariate(3, 1.5) for _ in range(10_000)]
+    series = _MetricSeries("latency", max_points=0)
+    for value in values:
+        series.append(value, 0.0, None)
+
+    ordered = sorted(values)
+    for fraction, approx in zip(
+        _PCT_FRACS, series.percentiles(_PCT_FRACS), strict=True
+    ):
+        exact = ordered[int(len(ordered) * fraction)]
+        assert approx == pytest.approx(exact, rel=0.01)
+
+
+def test_percentiles_nonpositive_values() -> None:
+    series = _MetricSeries("delta", max_points=0)
+    for value in (-5.0, 0.0, 0.0, 10.0, 20.0):
+        series.append(value, 0.0, None)
+
+    p50, _, _, _, p99 = series.percentiles(_PCT_FRACS)
+    assert p50 == -5.0
+    assert p99 == pytest.approx(20.0, rel=0.01)
+    assert series.min == -5.0
+    assert series.report_summary()["avg"] == 5.0
+
+
+def test_percentiles_all_nonpositive() -> None:
+    series = _MetricSeries("delta", max_points=0)
+    for value in (0.0, -1.0, -2.0):
+        series.append(value, 0.0, None)
+
+    assert series.percentiles(_PCT_FRACS) == (-2.0,) * len(_PCT_FRACS)
+
+
+def test_non_finite_values_are_ignored() -> None:
+    series = _MetricSeries("latency", max_points=10)
+    series.append(1.0, 0.0, None)
+    series.append(math.inf, 0.0, None)
+    series.append(math.nan, 0.0, None)
+    series.extend([-math.inf, 2.0], 0.0)
+
+    assert series.count == 2
+    assert series.max == 2.0
+    assert _values(series) == [1.0, 2.0]
+    assert series.report_summary()["avg"] == 1.5
+
+
+def test_percentiles_survive_lost_bucket_updates() -> None:
+    series = _MetricSeries("latency", max_points=0)
+    for value in range(1, 101):
+        series.append(float(value), 0.0, None)
+    series.count += 50
+
+    assert series.percentiles(_PCT_FRACS)[-1] == pytest.approx(99.0, rel=0.01)
+
+
+def test_rows_wrap_oldest_first() -> None:
+    series = _MetricSeries("latency", max_points=3)
+    for value in range(1, 6):
+        tags = {"n": str(value)} if value % 2 else None
+        series.append(float(value), float(value), tags)
+
+    assert list(series.rows(["n"])) == [
+        ("latency", 3.0, 3.0, "3"),
+        ("latency", 4.0, 4.0, ""),
+        ("latency", 5.0, 5.0, "5"),
+    ]
+    assert series.count == 5
+
+
+def test_extend_across_wrap() -> None:
+    series = _MetricSeries("db", max_points=4)
+    series.extend([1.0, 2.0, 3.0], 0.0)
+    series.extend([4.0, 5.0, 6.0], 1.0)
+
+    assert _values(series) == [3.0, 4.0, 5.0, 6.0]
+    assert [row[2] for row in series.rows([])] == [0.0, 1.0, 1.0, 1.0]
+    assert series.count == 6
+
+
+def test_extend_larger_than_capacity() -> None:
+    series = _MetricSeries("db", max_points=4)
+    series.extend([float(value) for value in range(1, 8)], 0.0)
+
+    assert _values(series) == [4.0, 5.0, 6.0, 7.0]
+    series.append(8.0, 0.0, None)
+    assert _values(series) == [5.0, 6.0, 7.0, 8.0]
+
+
+def test_hot_cold_counter_collects() -> None:
+    counter = _HotColdCounter()
+    counter.add("a")
+    counter.add("a", 2)
+    counter.add("b")
+
+    assert dict(counter.collect()) == {"a": 3, "b": 1}
+    assert dict(counter.collect()) == {"a": 3, "b": 1}
+
+
+def test_hot_cold_counter_picks_up_late_writes() -> None:
+    counter = _HotColdCounter()
+    counter.add("a")
+    counter.collect()
+
+    # A writer that looked up the shard before the flip lands on the one
+    # that was just folded
+    counter._shards[counter._hot ^ 1]["a"] += 1
+    counter.add("a")
+
+    assert counter.collect()["a"] == 2
+    assert counter.collect()["a"] == 3
+    assert counter.collect()["a"] == 3
+
+
+def test_timer_points_share_tags(tmp_path) -> None:
+    collector = MetricsCollector(export_dir=str(tmp_path))
+    for _ in range(3):
+        with MetricsTimer("chart.data", {"chart_id": "1"}, collector=collector):
+            pass
+    with pytest.raises(ValueError, match="query failed"):
+        with MetricsTimer("chart.data", {"chart_id": "1"}, collector=collector):
+            raise ValueError("query failed")
+
+    tags = collector._metrics["chart.data"].tags
+    assert len({id(point_tags) for point_tags in tags.values()}) == 2
+    assert tags[0] == {"chart_id": "1", "success": "True"}
+    assert tags[3] == {"chart_id": "1", "success": "False"}
+
+
+def test_schedule_export_writes_snapshot(tmp_path) -> None:
+    collector = MetricsCollector(export_dir=str(tmp_path))
+    collector.increment("requests", 2)
+    collector.record("latency", 5.0)
+
+    assert collector.schedule_export("snapshot.json")
+    collector.increment("requests")
+    collector.wait_for_exports()
+
+    report = loads_json((tmp_path / "snapshot.json").read_bytes())
+    assert report["counters"] == {"requests": 2}
+    assert report["summaries"]["latency"]["count"] == 1
@@ -21,14 +21,66 @@ Superset API client for load testing with authentication and session management.
 
 import json
 import logging
+import os
+import random
 import time
-from typing import Any
-from urllib.parse import urljoin
+from functools import lru_cache
+from typing import Any, Callable
+from urllib.parse import urlencode, urljoin
 
+import gevent
 from locust import HttpUser
+from requests.adapters import HTTPAdapter
+
+from .helpers import dumps_json, FINAL_QUERY_STATUSES, loads_json, query_status
 
 logger = logging.getLogger(__name__)
 
+# Keep-alive pool sizing so concurrent requests of one user reuse connections
+POOL_CONNECTIONS = 64
+POOL_MAXSIZE = 256
+
+# Failure message prefixes for status codes reported by name
+_ERROR_MESSAGES = {401: "Unauthorized", 403: "Forbidden", 404: "Not found"}
+
+# Favorites endpoint base by FAB class name
+_FAVORITE_ENDPOINT_MAP = {
+    "Dashboard": "/api/v1/dashboard",
+    "Slice": "/api/v1/chart",
+}
+_FAV_POST_NAME = {
+    "Dashboard": "POST /api/v1/dashboard/<id>/favorites",
+    "Slice": "POST /api/v1/chart/<id>/favorites",
+}
+_FAV_DELETE_NAME = {
+    "Dashboard": "DELETE /api/v1/dashboard/<id>/favorites",
+    "Slice": "DELETE /api/v1/chart/<id>/favorites",
+}
+
+
+@lru_cache(maxsize=1024)
+def _join_url(base_url: str, endpoint: str) -> str:
+    """Join endpoint onto base URL, memoized since urljoin re-parses both."""
+    if endpoint.startswith("http"):
+        return endpoint
+    return urljoin(base_url, endpoint)
+
+
+@lru_cache(maxsize=256)
+def _paging_q(page: int, page_size: int, with_filters: bool = False) -> str:
+    """Build the ``q`` parameter for an unfiltered list request, memoized."""
+    q: dict[str, Any] = {"page": page, "page_size": page_size}
+    if with_filters:
+        q["filters"] = []
+    return json.dumps(q)
+
+
+def _list_q(page: int, page_size: int, filters: list | None) -> str:
+    """Build the ``q`` parameter for a filterable list request."""
+    if filters:
+        return json.dumps({"page": page, "page_size": page_size, "filters": filters})
+    return _paging_q(page, page_size, with_filters=True)
+
 
 class SupersetAPIClient:
     """
@@ -40,22 +92,30 @@ class SupersetAPIClient:
         self.user = user
         self.client = user.client
         self.base_url = base_url
+        adapter = HTTPAdapter(
+            pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=0
+        )
+        self.client.mount("http://", adapter)
+        self.client.mount("https://", adapter)
         self.csrf_token: str | None = None
         self.access_token: str | None = None
         self.refresh_token: str | None = None
         self.is_authenticated = False
         self._session_cookies: dict[str, str] = {}
+        self._base_headers: dict[str, str] = {}
+        self._update_headers()
+        # Per-user PRNG so scenarios don't share the global random state
+        self.rng = random.Random(os.urandom(8))
+        # Form-encoded login body, reused on re-login with the same credentials
+        self._login_credentials: tuple[str, str] | None = None
+        self._login_body = b""
 
     def _get_url(self, endpoint: str) -> str:
         """Build full URL for endpoint."""
-        if endpoint.startswith("http"):
-            return endpoint
-        return urljoin(self.base_url, endpoint)
+        return _join_url(self.base_url, endpoint)
 
-    def _get_headers(
-        self, extra_headers: dict[str, str] | None = None
-    ) -> dict[str, str]:
-        """Get headers with CSRF token and authentication."""
+    def _update_headers(self) -> None:
+        """Rebuild cached base headers after CSRF/access token changes."""
         headers = {
             "Content-Type": "application/json",
             "Accept": "application/json",
@@ -64,9 +124,27 @@ class SupersetAPIClient:
             headers["X-CSRFToken"] = self.csrf_token
         if self.access_token:
             headers["Authorization"] = f"Bearer {self.access_token}"
+        self._base_headers = headers
+
+    def _get_headers(
+        self, extra_headers: dict[str, str] | None = None
+    ) -> dict[str, str]:
+        """
+        Get headers with CSRF token and authentication.
+        The shared base dict is returned as-is and must not be mutated.
+        """
         if extra_headers:
-            headers.update(extra_headers)
-        return headers
+            return {**self._base_headers, **extra_headers}
+        return self._base_headers
+
+    def _login_form(self, username: str, password: str) -> bytes:
+        """Form-encoded login body, encoded once per client and credentials."""
+        if self._login_credentials != (username, password):
+            self._login_credentials = (username, password)
+            self._login_body = urlencode(
+                {"username": username, "password": password}
+            ).encode()
+        return self._login_body
 
     def login(self, username: str, password: str) -> bool:
         """
@@ -85,18 +163,14 @@ class SupersetAPIClient:
         self._fetch_csrf_token()
 
         # Perform login
-        login_data = {
-            "username": username,
-            "password": password,
-        }
-
-        headers = self._get_headers()
-        headers["Content-Type"] = "application/x-www-form-urlencoded"
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        if self.csrf_token:
+            headers["X-CSRFToken"] = self.csrf_token
 
         with self.client.post(
             "/login/",
-            data=login_data,
-            headers={"X-CSRFToken": self.csrf_token} if self.csrf_token else {},
+            data=self._login_form(username, password),
+            headers=headers,
             name="/login [POST]",
             catch_response=True,
             allow_redirects=True,
@@ -133,6 +207,7 @@ class SupersetAPIClient:
                 data = response.json()
                 self.access_token = data.get("access_token")
                 self.refresh_token = data.get("refresh_token")
+                self._update_headers()
                 self.is_authenticated = True
                 # Fetch CSRF token for API calls
                 self._fetch_csrf_token()
@@ -153,6 +228,7 @@ class SupersetAPIClient:
             if response.status_code == 200:
                 data = response.json()
                 self.csrf_token = data.get("result")
+                self._update_headers()
                 response.success()
                 return self.csrf_token
             else:
@@ -163,49 +239,70 @@ class SupersetAPIClient:
         """Refresh CSRF token."""
         return self._fetch_csrf_token()
 
-    def get(
+    def _request(
         self,
+        method: str,
         endpoint: str,
         name: str | None = None,
-        params: dict | None = None,
+        catch_response: bool = True,
         **kwargs,
     ) -> Any:
-        """Make GET request to API endpoint."""
+        """
+        Make request to API endpoint.
+        With catch_response=False Locust's ResponseContextManager is skipped;
+        HTTP errors are still reported by Locust, just without custom messages.
+        """
         url = self._get_url(endpoint)
         request_name = name or endpoint
 
-        with self.client.get(
+        if not catch_response:
+            response = self.client.request(
+                method, url, headers=self._get_headers(), name=request_name, **kwargs
+            )
+            return self._parse_response(response)
+
+        with self.client.request(
+            method,
             url,
             headers=self._get_headers(),
-            params=params,
             name=request_name,
             catch_response=True,
             **kwargs,
         ) as response:
             return self._handle_response(response, request_name)
 
+    def get(
+        self,
+        endpoint: str,
+        name: str | None = None,
+        params: dict | None = None,
+        catch_response: bool = True,
+        **kwargs,
+    ) -> Any:
+        """Make GET request to API endpoint."""
+        return self._request(
+            "GET", endpoint, name, catch_response, params=params, **kwargs
+        )
+
     def post(
         self,
         endpoint: str,
         name: str | None = None,
         data: dict | None = None,
         json_data: dict | None = None,
+        catch_response: bool = True,
         **kwargs,
     ) -> Any:
         """Make POST request to API endpoint."""
-        url = self._get_url(endpoint)
-        request_name = name or endpoint
-
-        with self.client.post(
-            url,
-            headers=self._get_headers(),
-            data=data,
-            json=json_data,
-            name=request_name,
-            catch_response=True,
+        # Serialize JSON bodies ourselves so orjson is used when installed
+        return self._request(
+            "POST",
+            endpoint,
+            name,
+            catch_response,
+            data=dumps_json(json_data) if json_data is not None else data,
             **kwargs,
-        ) as response:
-            return self._handle_response(response, request_name)
+        )
 
     def put(
         self,
@@ -213,70 +310,81 @@ class SupersetAPIClient:
         name: str | None = None,
         data: dict | None = None,
         json_data: dict | None = None,
+        catch_response: bool = True,
         **kwargs,
     ) -> Any:
         """Make PUT request to API endpoint."""
-        url = self._get_url(endpoint)
-        request_name = name or endpoint
-
-        with self.client.put(
-            url,
-            headers=self._get_headers(),
-            data=data,
-            json=json_data,
-            name=request_name,
-            catch_response=True,
+        return self._request(
+            "PUT",
+            endpoint,
+            name,
+            catch_response,
+            data=dumps_json(json_data) if json_data is not None else data,
             **kwargs,
-        ) as response:
-            return self._handle_response(response, request_name)
+        )
 
-    def delete(self, endpoint: str, name: str | None = None, **kwargs) -> Any:
+    def delete(
+        self,
+        endpoint: str,
+        name: str | None = None,
+        catch_response: bool = True,
+        **kwargs,
+    ) -> Any:
         """Make DELETE request to API endpoint."""
-        url = self._get_url(endpoint)
-        request_name = name or endpoint
+        return self._request("DELETE", endpoint, name, catch_response, **kwargs)
 
-        with self.client.delete(
-            url,
-            headers=self._get_headers(),
-            name=request_name,
-            catch_response=True,
-            **kwargs,
-        ) as response:
-            return self._handle_response(response, request_name)
+    def fanout(self, calls: list[Callable[[], Any]]) -> list[Any]:
+        """
+        Run independent request calls concurrently.
+        Each call is a zero-argument callable, typically a bound client method
+        wrapped in functools.partial; results are returned in call order.
+        Timing is reported to Locust per request as usual. Every call runs to
+        completion, then the first exception raised by a call is re-raised.
+        """
+        greenlets = [gevent.spawn(call) for call in calls]
+        gevent.joinall(greenlets)
+        for greenlet in greenlets:
+            if greenlet.exception is not None:
+                raise greenlet.exception
+        return [greenlet.value for greenlet in greenlets]
+
+    def _parse_response(self, response) -> Any:
+        """Parse response body without Locust success/failure bookkeeping."""
+        if response.status_code >= 400:
+            if response.status_code == 401 and self.refresh_token:
+                self._refresh_access_token()
+            return None
+
+        if response.headers.get("Content-Type", "").startswith("application/json"):
+            try:
+                return loads_json(response.content)
+            except json.JSONDecodeError:
+                return response.text
+        return response.text
 
     def _handle_response(self, response, request_name: str) -> Any:
         """Handle API response with error checking."""
         try:
-            if response.status_code == 401:
-                # Token expired, try to refresh
-                if self.refresh_token:
-                    self._refresh_access_token()
-                response.failure(f"Unauthorized: {request_name}")
-                return None
-
-            if response.status_code == 403:
-                response.failure(f"Forbidden: {request_name}")
-                return None
-
-            if response.status_code == 404:
-                response.failure(f"Not found: {request_name}")
-                return None
-
-            if response.status_code >= 500:
-                response.failure(f"Server error {response.status_code}: {request_name}")
-                return None
-
-            if response.status_code >= 400:
-                response.failure(f"Client error {response.status_code}: {request_name}")
-                return None
+            status = response.status_code
+            if status < 400:
+                response.success()
+                if response.headers.get("Content-Type", "").startswith(
+                    "application/json"
+                ):
+                    return loads_json(response.content)
+                return response.text
 
-            # Success
-            response.success()
+            if status == 401 and self.refresh_token:
+                # Token expired, try to refresh
+                self._refresh_access_token()
 
-            # Try to parse JSON response
-            if response.headers.get("Content-Type", "").startswith("application/json"):
-                return response.json()
-            return response.text
+            if status in _ERROR_MESSAGES:
+                response.failure(f"{_ERROR_MESSAGES[status]}: {request_name}")
+            elif status >= 500:
+                response.failure(f"Server error {status}: {request_name}")
+            else:
+                response.failure(f"Client error {status}: {request_name}")
+            return None
 
         except json.JSONDecodeError:
             return response.text
@@ -299,6 +407,7 @@ class SupersetAPIClient:
             if response.status_code == 200:
                 data = response.json()
                 self.access_token = data.get("access_token")
+                self._update_headers()
                 response.success()
                 return True
             else:
@@ -311,19 +420,20 @@ class SupersetAPIClient:
         self, page: int = 0, page_size: int = 25, filters: list | None = None
     ) -> dict | None:
         """Get list of dashboards."""
-        params = {
-            "q": json.dumps(
-                {"page": page, "page_size": page_size, "filters": filters or []}
-            )
-        }
+        params = {"q": _list_q(page, page_size, filters)}
         return self.get(
-            "/api/v1/dashboard/", name="GET /api/v1/dashboard/", params=params
+            "/api/v1/dashboard/",
+            name="GET /api/v1/dashboard/",
+            params=params,
+            catch_response=False,
         )
 
     def get_dashboard(self, id_or_slug: int | str) -> dict | None:
         """Get single dashboard by ID or slug."""
         return self.get(
-            f"/api/v1/dashboard/{id_or_slug}", name="GET /api/v1/dashboard/<id>"
+            f"/api/v1/dashboard/{id_or_slug}",
+            name="GET /api/v1/dashboard/<id>",
+            catch_response=False,
         )
 
     def get_dashboard_charts(self, dashboard_id: int) -> dict | None:
@@ -331,22 +441,28 @@ class SupersetAPIClient:
         return self.get(
             f"/api/v1/dashboard/{dashboard_id}/charts",
             name="GET /api/v1/dashboard/<id>/charts",
+            catch_response=False,
         )
 
     def get_charts(
         self, page: int = 0, page_size: int = 25, filters: list | None = None
     ) -> dict | None:
         """Get list of charts."""
-        params = {
-            "q": json.dumps(
-                {"page": page, "page_size": page_size, "filters": filters or []}
-            )
-        }
-        return self.get("/api/v1/chart/", name="GET /api/v1/chart/", params=params)
+        params = {"q": _list_q(page, page_size, filters)}
+        return self.get(
+            "/api/v1/chart/",
+            name="GET /api/v1/chart/",
+            params=params,
+            catch_response=False,
+        )
 
     def get_chart(self, chart_id: int) -> dict | None:
         """Get single chart by ID."""
-        return self.get(f"/api/v1/chart/{chart_id}", name="GET /api/v1/chart/<id>")
+        return self.get(
+            f"/api/v1/chart/{chart_id}",
+            name="GET /api/v1/chart/<id>",
+            catch_response=False,
+        )
 
     def get_chart_data(self, query_context: dict) -> dict | None:
         """Execute chart data query."""
@@ -372,24 +488,30 @@ class SupersetAPIClient:
         self, page: int = 0, page_size: int = 25, filters: list | None = None
     ) -> dict | None:
         """Get list of datasets."""
-        params = {
-            "q": json.dumps(
-                {"page": page, "page_size": page_size, "filters": filters or []}
-            )
-        }
-        return self.get("/api/v1/dataset/", name="GET /api/v1/dataset/", params=params)
+        params = {"q": _list_q(page, page_size, filters)}
+        return self.get(
+            "/api/v1/dataset/",
+            name="GET /api/v1/dataset/",
+            params=params,
+            catch_response=False,
+        )
 
     def get_dataset(self, dataset_id: int) -> dict | None:
         """Get single dataset by ID."""
         return self.get(
-            f"/api/v1/dataset/{dataset_id}", name="GET /api/v1/dataset/<id>"
+            f"/api/v1/dataset/{dataset_id}",
+            name="GET /api/v1/dataset/<id>",
+            catch_response=False,
         )
 
     def get_databases(self, page: int = 0, page_size: int = 25) -> dict | None:
         """Get list of databases."""
-        params = {"q": json.dumps({"page": page, "page_size": page_size})}
+        params = {"q": _paging_q(page, page_size)}
         return self.get(
-            "/api/v1/database/", name="GET /api/v1/database/", params=params
+            "/api/v1/database/",
+            name="GET /api/v1/database/",
+            params=params,
+            catch_response=False,
         )
 
     def get_database_schemas(self, database_id: int) -> dict | None:
@@ -397,6 +519,7 @@ class SupersetAPIClient:
         return self.get(
             f"/api/v1/database/{database_id}/schemas/",
             name="GET /api/v1/database/<id>/schemas",
+            catch_response=False,
         )
 
     def get_database_tables(
@@ -408,6 +531,7 @@ class SupersetAPIClient:
             f"/api/v1/database/{database_id}/tables/",
             name="GET /api/v1/database/<id>/tables",
             params=params,
+            catch_response=False,
         )
 
     def execute_sql(
@@ -453,15 +577,49 @@ class SupersetAPIClient:
             result = self.get(
                 f"/api/v1/query/{query_id}", name="GET /api/v1/query/<id> [poll]"
             )
-            if result and result.get("result", {}).get("status") in (
-                "success",
-                "failed",
-                "stopped",
-            ):
+            if query_status(result) in FINAL_QUERY_STATUSES:
                 return result
             time.sleep(poll_interval)
         return None
 
+    def poll_many(
+        self, query_ids: list[str], max_attempts: int = 60, poll_interval: float = 1.0
+    ) -> dict[str, dict | None]:
+        """
+        Poll several async queries at once.
+        Each round issues the GETs for all still-pending queries concurrently,
+        so one poll interval covers every outstanding query.
+        Returns final results by query ID (None for queries still pending).
+        """
+        results: dict[str, dict | None] = dict.fromkeys(query_ids)
+        pending = list(query_ids)
+
+        for _ in range(max_attempts):
+            greenlets = [
+                gevent.spawn(
+                    self.get,
+                    f"/api/v1/query/{query_id}",
+                    name="GET /api/v1/query/<id> [poll]",
+                )
+                for query_id in pending
+            ]
+            gevent.joinall(greenlets)
+
+            still_pending = []
+            for query_id, greenlet in zip(pending, greenlets, strict=True):
+                result = greenlet.value
+                if query_status(result) in FINAL_QUERY_STATUSES:
+                    results[query_id] = result
+                else:
+                    still_pending.append(query_id)
+
+            pending = still_pending
+            if not pending:
+                break
+            time.sleep(poll_interval)
+
+        return results
+
     def get_explore_form_data(self, key: str) -> dict | None:
         """Get explore form data by key."""
         return self.get(
@@ -493,39 +651,46 @@ class SupersetAPIClient:
 
     def get_tags(self, page: int = 0, page_size: int = 25) -> dict | None:
         """Get list of tags."""
-        params = {"q": json.dumps({"page": page, "page_size": page_size})}
-        return self.get("/api/v1/tag/", name="GET /api/v1/tag/", params=params)
+        params = {"q": _paging_q(page, page_size)}
+        return self.get(
+            "/api/v1/tag/",
+            name="GET /api/v1/tag/",
+            params=params,
+            catch_response=False,
+        )
 
     def get_queries(self, page: int = 0, page_size: int = 25) -> dict | None:
         """Get list of queries."""
-        params = {"q": json.dumps({"page": page, "page_size": page_size})}
-        return self.get("/api/v1/query/", name="GET /api/v1/query/", params=params)
+        params = {"q": _paging_q(page, page_size)}
+        return self.get(
+            "/api/v1/query/",
+            name="GET /api/v1/query/",
+            params=params,
+            catch_response=False,
+        )
 
     def get_saved_queries(self, page: int = 0, page_size: int = 25) -> dict | None:
         """Get list of saved queries."""
-        params = {"q": json.dumps({"page": page, "page_size": page_size})}
+        params = {"q": _paging_q(page, page_size)}
         return self.get(
-            "/api/v1/saved_query/", name="GET /api/v1/saved_query/", params=params
+            "/api/v1/saved_query/",
+            name="GET /api/v1/saved_query/",
+            params=params,
+            catch_response=False,
         )
 
     def add_favorite(self, class_name: str, obj_id: int) -> dict | None:
         """Add item to favorites."""
-        endpoint_map = {
-            "Dashboard": "/api/v1/dashboard",
-            "Slice": "/api/v1/chart",
-        }
-        base = endpoint_map.get(class_name, "/api/v1/dashboard")
+        base = _FAVORITE_ENDPOINT_MAP.get(class_name, "/api/v1/dashboard")
         return self.post(
-            f"{base}/{obj_id}/favorites/", name=f"POST {base}/<id>/favorites"
+            f"{base}/{obj_id}/favorites/",
+            name=_FAV_POST_NAME.get(class_name, _FAV_POST_NAME["Dashboard"]),
         )
 
     def remove_favorite(self, class_name: str, obj_id: int) -> dict | None:
         """Remove item from favorites."""
-        endpoint_map = {
-            "Dashboard": "/api/v1/dashboard",
-            "Slice": "/api/v1/chart",
-        }
-        base = endpoint_map.get(class_name, "/api/v1/dashboard")
+        base = _FAVORITE_ENDPOINT_MAP.get(class_name, "/api/v1/dashboard")
         return self.delete(
-            f"{base}/{obj_id}/favorites/", name=f"DELETE {base}/<id>/favorites"
+            f"{base}/{obj_id}/favorites/",
+            name=_FAV_DELETE_NAME.get(class_name, _FAV_DELETE_NAME["Dashboard"]),
         )
@@ -20,50 +20,141 @@ Helper utilities for load testing.
 """
 
 import hashlib
+import json  # noqa: TID251 superset.utils.json needs the Flask/pandas stack
+import os
 import random
-import string
 import time
 import uuid
 from datetime import datetime, timedelta
-from typing import Any, Callable, TypeVar
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, Sequence, TypeVar
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 T = TypeVar("T")
 
+_GRANULARITIES = (
+    "PT1M",  # 1 minute
+    "PT5M",  # 5 minutes
+    "PT15M",  # 15 minutes
+    "PT1H",  # 1 hour
+    "P1D",  # 1 day
+    "P1W",  # 1 week
+    "P1M",  # 1 month
+)
+
+_TIME_RANGES = (
+    "Last day",
+    "Last week",
+    "Last month",
+    "Last quarter",
+    "Last year",
+    "No filter",
+)
+
+_ROW_LIMITS = (100, 500, 1000, 5000, 10000, 50000)
+
+_VIZ_TYPES = (
+    "echarts_timeseries_line",
+    "echarts_timeseries_bar",
+    "echarts_area",
+    "big_number_total",
+    "big_number",
+    "table",
+    "pivot_table_v2",
+    "echarts_pie",
+    "dist_bar",
+    "bar",
+    "line",
+    "area",
+    "scatter",
+    "bubble",
+    "treemap",
+    "box_plot",
+    "histogram",
+    "funnel",
+    "gauge_chart",
+    "heatmap",
+    "world_map",
+    "filter_box",
+)
+
+# Async query statuses that end polling (Superset reports ``timed_out`` too)
+_SUCCESS_STATUSES = ("success", "completed", "done")
+_FAILURE_STATUSES = ("failed", "error", "stopped", "cancelled", "timed_out")
+FINAL_QUERY_STATUSES = frozenset((*_SUCCESS_STATUSES, *_FAILURE_STATUSES))
+
+# Dedicated generator for hot-path choices, plus bit widths for pow2 sizes
+_rng = random.Random()
+_POW2_BITS = {1 << bits: bits for bits in range(9)}
+
+
+def dumps_json(obj: Any) -> bytes:
+    """Serialize a request payload to compact JSON bytes (orjson if available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def loads_json(data: bytes) -> Any:
+    """Parse a JSON response body straight from bytes (orjson if available)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
 
 def random_string(length: int = 10) -> str:
-    """Generate random alphanumeric string."""
-    return "".join(random.choices(string.ascii_letters + string.digits, k=length))
+    """Generate random alphanumeric (lowercase hex) string."""
+    return os.urandom((length + 1) // 2).hex()[:length]
 
 
-def random_choice(items: list[T]) -> T:
-    """Safely choose random item from list."""
+def random_choice(items: list[T], rng: random.Random | None = None) -> T:
+    """Safely choose random item from list (using rng if given)."""
     if not items:
         raise ValueError("Cannot choose from empty list")
-    return random.choice(items)
+    return (rng or random).choice(items)
+
 
+def fast_choice(items: Sequence[T], rng: random.Random | None = None) -> T:
+    """Choose random item, using a single getrandbits call for pow2 sizes."""
+    rng = rng or _rng
+    bits = _POW2_BITS.get(len(items))
+    if bits is None:
+        return rng.choice(items)
+    return items[rng.getrandbits(bits)]
 
-def random_choices(items: list[T], k: int = 1) -> list[T]:
+
+def random_choices(
+    items: list[T], k: int = 1, rng: random.Random | None = None
+) -> list[T]:
     """Safely choose k random items from list (with replacement)."""
     if not items:
         raise ValueError("Cannot choose from empty list")
-    return random.choices(items, k=k)
+    return (rng or random).choices(items, k=k)
 
 
-def random_sample(items: list[T], k: int = 1) -> list[T]:
+def random_sample(
+    items: list[T], k: int = 1, rng: random.Random | None = None
+) -> list[T]:
     """Safely sample k random items from list (without replacement)."""
     if not items:
         raise ValueError("Cannot sample from empty list")
     k = min(k, len(items))
-    return random.sample(items, k)
+    return (rng or random).sample(items, k)
 
 
-def weighted_random_choice(items: list[T], weights: list[int]) -> T:
+def weighted_random_choice(
+    items: list[T], weights: list[int], rng: random.Random | None = None
+) -> T:
     """Choose random item based on weights."""
     if not items:
         raise ValueError("Cannot choose from empty list")
     if len(items) != len(weights):
         raise ValueError("Items and weights must have same length")
-    return random.choices(items, weights=weights, k=1)[0]
+    return (rng or random).choices(items, weights=weights, k=1)[0]
 
 
 def generate_uuid() -> str:
@@ -72,9 +163,12 @@ def generate_uuid() -> str:
 
 
 def generate_cache_key(*args) -> str:
-    """Generate cache key from arguments."""
-    key_str = ":".join(str(arg) for arg in args)
-    return hashlib.md5(key_str.encode()).hexdigest()
+    """Generate cache key from arguments (non-cryptographic use)."""
+    digest = hashlib.blake2b(digest_size=8)
+    for arg in args:
+        digest.update(str(arg).encode())
+        digest.update(b":")
+    return digest.hexdigest()
 
 
 def random_date_range(start: datetime, end: datetime) -> tuple[datetime, datetime]:
@@ -89,66 +183,37 @@ def random_date_range(start: datetime, end: datetime) -> tuple[datetime, datetim
     return range_start, range_end
 
 
-def random_granularity() -> str:
+def random_granularity(rng: random.Random | None = None) -> str:
     """Return random time granularity."""
-    granularities = [
-        "PT1M",  # 1 minute
-        "PT5M",  # 5 minutes
-        "PT15M",  # 15 minutes
-        "PT1H",  # 1 hour
-        "P1D",  # 1 day
-        "P1W",  # 1 week
-        "P1M",  # 1 month
-    ]
-    return random_choice(granularities)
-
-
-def random_time_range() -> str:
+    return (rng or random).choice(_GRANULARITIES)
+
+
+def random_time_range(rng: random.Random | None = None) -> str:
     """Return random time range string."""
-    time_ranges = [
-        "Last day",
-        "Last week",
-        "Last month",
-        "Last quarter",
-        "Last year",
-        "No filter",
-    ]
-    return random_choice(time_ranges)
-
-
-def random_row_limit() -> int:
+    return (rng or random).choice(_TIME_RANGES)
+
+
+def random_row_limit(rng: random.Random | None = None) -> int:
     """Return random row limit."""
-    limits = [100, 500, 1000, 5000, 10000, 50000]
-    return random_choice(limits)
+    return (rng or random).choice(_ROW_LIMITS)
 
 
-def random_viz_type() -> str:
+def random_viz_type(rng: random.Random | None = None) -> str:
     """Return random visualization type."""
-    viz_types = [
-        "echarts_timeseries_line",
-        "echarts_timeseries_bar",
-        "echarts_area",
-        "big_number_total",
-        "big_number",
-        "table",
-        "pivot_table_v2",
-        "echarts_pie",
-        "dist_bar",
-        "bar",
-        "line",
-        "area",
-        "scatter",
-        "bubble",
-        "treemap",
-        "box_plot",
-        "histogram",
-        "funnel",
-        "gauge_chart",
-        "heatmap",
-        "world_map",
-        "filter_box",
-    ]
-    return random_choice(viz_types)
+    return (rng or random).choice(_VIZ_TYPES)
+
+
+def query_status(result: Any) -> str | None:
+    """Extract the lowercased status of an async query/operation response."""
+    if not isinstance(result, dict):
+        return None
+    nested = result.get("result")
+    status = (
+        result.get("status")
+        or (nested.get("status") if isinstance(nested, dict) else None)
+        or result.get("state")
+    )
+    return status.lower() if isinstance(status, str) else None
 
 
 def wait_for_async_query(
@@ -158,6 +223,10 @@ def wait_for_async_query(
     max_attempts: int = 60,
     poll_interval: float = 1.0,
     timeout: float | None = None,
+    initial_interval: float | None = None,
+    max_interval: float | None = None,
+    backoff: float = 2.0,
+    jitter: float = 0.2,
 ) -> dict | None:
     """
     Wait for async operation to complete by polling.
@@ -169,43 +238,46 @@ def wait_for_async_query(
         max_attempts: Maximum number of poll attempts
         poll_interval: Seconds between polls
         timeout: Optional total timeout in seconds
+        initial_interval: Enables exponential backoff starting at this delay
+        max_interval: Upper bound for the backoff delay (default: poll_interval)
+        backoff: Multiplier applied to the delay after each poll
+        jitter: Relative random spread applied to each backoff delay
 
     Returns:
         Final result dict or None if timeout/failure
     """
-    if success_statuses is None:
-        success_statuses = ["success", "completed", "done"]
-    if failure_statuses is None:
-        failure_statuses = ["failed", "error", "stopped", "cancelled"]
-
-    start_time = time.time()
-
-    for attempt in range(max_attempts):
-        if timeout and (time.time() - start_time) > timeout:
+    if success_statuses is None and failure_statuses is None:
+        final_statuses = FINAL_QUERY_STATUSES
+    else:
+        if success_statuses is None:
+            success_statuses = list(_SUCCESS_STATUSES)
+        if failure_statuses is None:
+            failure_statuses = list(_FAILURE_STATUSES)
+        # Success and failure both end polling, so one lowercased set suffices
+        final_statuses = frozenset(
+            s.lower() for s in (*success_statuses, *failure_statuses)
+        )
+
+    interval = poll_interval if initial_interval is None else initial_interval
+    if max_interval is None:
+        max_interval = poll_interval
+
+    deadline = time.monotonic() + timeout if timeout else None
+
+    for _ in range(max_attempts):
+        if deadline is not None and time.monotonic() > deadline:
             return None
 
         result = poll_func()
-        if result is None:
+
+        if query_status(result) in final_statuses:
+            return result
+
+        if initial_interval is None:
             time.sleep(poll_interval)
-            continue
-
-        status = None
-        # Try different status field locations
-        if isinstance(result, dict):
-            status = (
-                result.get("status")
-                or result.get("result", {}).get("status")
-                or result.get("state")
-            )
-
-        if status:
-            status_lower = status.lower()
-            if status_lower in [s.lower() for s in success_statuses]:
-                return result
-            if status_lower in [s.lower() for s in failure_statuses]:
-                return result
-
-        time.sleep(poll_interval)
+        else:
+            time.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+            interval = min(interval * backoff, max_interval)
 
     return None
 
@@ -337,17 +409,27 @@ class Timer:
     """Context manager for timing operations."""
 
     def __init__(self):
-        self.start_time: float = 0
-        self.end_time: float = 0
-        self.duration: float = 0
+        self.start_ns: int = 0
+        self.end_ns: int = 0
+        self.duration: float = 0  # seconds
+
+    @property
+    def start_time(self) -> float:
+        """Start as monotonic seconds (kept for callers of the float API)."""
+        return self.start_ns * 1e-9
+
+    @property
+    def end_time(self) -> float:
+        """End as monotonic seconds (kept for callers of the float API)."""
+        return self.end_ns * 1e-9
 
     def __enter__(self):
-        self.start_time = time.perf_counter()
+        self.start_ns = time.monotonic_ns()
         return self
 
     def __exit__(self, *args):
-        self.end_time = time.perf_counter()
-        self.duration = self.end_time - self.start_time
+        self.end_ns = time.monotonic_ns()
+        self.duration = (self.end_ns - self.start_ns) * 1e-9
 
 
 def exponential_backoff(
@@ -360,6 +442,11 @@ def exponential_backoff(
     return delay
 
 
-def chunk_list(lst: list[T], chunk_size: int) -> list[list[T]]:
-    """Split list into chunks of specified size."""
-    return [lst[i : i + chunk_size] for i in range(0, len(lst), chunk_size)]
+def chunk_list(lst: Iterable[T], chunk_size: int) -> Iterator[list[T]]:
+    """
+    Lazily split an iterable into chunks of specified size.
+    Wrap in list() when all chunks are needed at once.
+    """
+    it = iter(lst)
+    while chunk := list(islice(it, chunk_size)):
+        yield chunk
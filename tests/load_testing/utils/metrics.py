@@ -22,29 +22,68 @@ Custom metrics collection for load testing.
 import csv
 import json
 import logging
+import math
+import random
+import sys
 import threading
 import time
+from array import array
 from collections import defaultdict
-from dataclasses import dataclass, field
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
 from datetime import datetime
+from itertools import chain
 from pathlib import Path
-from statistics import mean, median, stdev
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Iterator, Mapping
+
+import gevent
+from gevent.event import AsyncResult
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
 
 logger = logging.getLogger(__name__)
 
+# Shared read-only tags for the success flag of response times
+_SUCCESS_TAGS = {
+    True: MappingProxyType({"success": "True"}),
+    False: MappingProxyType({"success": "False"}),
+}
+
+# Shared read-only tags for MetricsTimer points by (label items, success)
+_Labels = tuple[tuple[str, str], ...]
+_TIMER_TAGS: dict[tuple[_Labels, bool], Mapping[str, str]] = {}
+
+# Interned metric/counter names by prefix, then endpoint
+_NAME_CACHE: dict[str, dict[str, str]] = defaultdict(dict)
+
+
+def _timer_tags(labels: _Labels, success: bool) -> Mapping[str, str]:
+    """Return the shared tags for a timer point, building them only once."""
+    if not labels:
+        return _SUCCESS_TAGS[success]
+    key = (labels, success)
+    tags = _TIMER_TAGS.get(key)
+    if tags is None:
+        tags = _TIMER_TAGS.setdefault(
+            key, MappingProxyType({**dict(labels), "success": str(success)})
+        )
+    return tags
 
-@dataclass
-class MetricPoint:
-    """Single metric measurement point."""
 
-    name: str
-    value: float
-    timestamp: float = field(default_factory=time.time)
-    tags: dict[str, str] = field(default_factory=dict)
+def _metric_name(prefix: str, endpoint: str) -> str:
+    """Return the interned ``prefix.endpoint`` name, formatting it only once."""
+    names = _NAME_CACHE[prefix]
+    name = names.get(endpoint)
+    if name is None:
+        name = names.setdefault(endpoint, sys.intern(f"{prefix}.{endpoint}"))
+    return name
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MetricSummary:
     """Summary statistics for a metric."""
 
@@ -63,139 +102,487 @@ class MetricSummary:
     std_dev: float
 
 
+# Relative width of a histogram bucket (1%)
+_BUCKET_LOG_BASE = math.log(1.01)
+_INV_BUCKET_LOG_BASE = 1 / _BUCKET_LOG_BASE
+_floor = math.floor
+_log = math.log
+_isfinite = math.isfinite
+
+# Percentiles reported in summaries: p50, p75, p90, p95, p99
+_PCT_FRACS = (0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+def _bucket_value(index: int) -> float:
+    """Midpoint of a logarithmic histogram bucket."""
+    return math.exp((index + 0.5) * _BUCKET_LOG_BASE)
+
+
+class _MetricSeries:
+    """
+    Running aggregates for one metric, with optional raw points.
+
+    Count, total, min, max and variance (Welford) are updated in O(1) per
+    value, and percentiles come from a logarithmic histogram with 1% wide
+    buckets, so summaries don't depend on the number of points. The most
+    recent ``max_points`` raw values and timestamps (used for CSV export)
+    are kept as C doubles in a ring buffer; tags are kept sparsely by point
+    index. With ``max_points=0`` no raw points are kept.
+    """
+
+    __slots__ = (
+        "name",
+        "max_points",
+        "_next",
+        "size",
+        "values",
+        "timestamps",
+        "tags",
+        "count",
+        "total",
+        "min",
+        "max",
+        "mean",
+        "m2",
+        "buckets",
+        "_percentiles",
+        "sample_rate",
+    )
+
+    def __init__(self, name: str, max_points: int):
+        self.name = name
+        self.max_points = max_points
+        # Slot to overwrite next once the ring buffer is full (oldest point)
+        self._next = 0
+        # Points stored; the arrays may be preallocated beyond this
+        self.size = 0
+        self.values = array("d")
+        self.timestamps = array("d")
+        self.tags: dict[int, Mapping[str, str]] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self.m2 = 0.0
+        # Histogram: log bucket index -> count (None for values <= 0)
+        self.buckets: dict[int | None, int] = {}
+        # Last computed percentiles, reused while count is unchanged
+        self._percentiles: tuple | None = None
+        # Fraction of events actually recorded (see sampled_timer)
+        self.sample_rate = 1.0
+
+    def _observe(self, value: float) -> None:
+        count = self.count = self.count + 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        delta = value - self.mean
+        mean = self.mean = self.mean + delta / count
+        self.m2 += delta * (value - mean)
+        key = _floor(_log(value) * _INV_BUCKET_LOG_BASE) if value > 0 else None
+        buckets = self.buckets
+        buckets[key] = buckets.get(key, 0) + 1
+
+    def append(
+        self, value: float, timestamp: float, tags: Mapping[str, str] | None
+    ) -> None:
+        # inf/nan would poison the aggregates and has no histogram bucket
+        if not _isfinite(value):
+            return
+        self._observe(value)
+        if self.max_points:
+            self._store(value, timestamp, tags)
+
+    def extend(self, values: list[float], timestamp: float) -> None:
+        values = [value for value in values if _isfinite(value)]
+        for value in values:
+            self._observe(value)
+        if not self.max_points:
+            return
+        size = self.size
+        end = size + len(values)
+        if end <= self.max_points:
+            self.reserve(end)
+            self.timestamps[size:end] = array("d", [timestamp]) * len(values)
+            self.values[size:end] = array("d", values)
+            self.size = end
+        else:
+            for value in values:
+                self._store(value, timestamp, None)
+
+    def reserve(self, capacity: int) -> None:
+        """
+        Make room for ``capacity`` points (capped at max_points) up front.
+        Growth follows CPython's list over-allocation (n + n/8 + 6).
+        """
+        allocated = len(self.values)
+        if capacity <= allocated:
+            return
+        capacity = min(capacity + (capacity >> 3) + 6, self.max_points)
+        padding = bytes(8 * (capacity - allocated))
+        self.timestamps.frombytes(padding)
+        self.values.frombytes(padding)
+
+    def _store(
+        self, value: float, timestamp: float, tags: Mapping[str, str] | None
+    ) -> None:
+        size = self.size
+        if size < self.max_points:
+            if size == len(self.values):
+                self.reserve(size + 1)
+            if tags:
+                self.tags[size] = tags
+            self.timestamps[size] = timestamp
+            self.values[size] = value
+            # Publish last, readers only look at the first ``size`` points
+            self.size = size + 1
+            return
+
+        # Full: overwrite the oldest point, advancing without a modulo
+        idx = self._next
+        self._next = idx + 1 if idx + 1 < self.max_points else 0
+        if tags:
+            self.tags[idx] = tags
+        else:
+            self.tags.pop(idx, None)
+        self.timestamps[idx] = timestamp
+        self.values[idx] = value
+
+    @property
+    def estimated_count(self) -> int:
+        """Recorded count scaled back up by the sample rate."""
+        return round(self.count / self.sample_rate)
+
+    @property
+    def std_dev(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def percentiles(self, fractions: tuple[float, ...]) -> tuple[float, ...]:
+        """Approximate percentiles (within 1%) in a single histogram walk."""
+        count = self.count
+        cached = self._percentiles
+        if cached is not None and cached[0] == count and cached[1] == fractions:
+            return cached[2]
+
+        # Rank against a copy of the histogram itself, so that a count
+        # drifting from it cannot walk past the last bucket
+        buckets = dict(self.buckets)
+        total = sum(buckets.values())
+        # Nonpositive values sort first; report them as the minimum
+        keys = sorted(key for key in buckets if key is not None)
+        ordered = ([None] if None in buckets else []) + keys
+        results = []
+        cumulative = 0
+        it = iter(ordered)
+        key = None
+        for fraction in fractions:
+            rank = min(int(total * fraction), total - 1)
+            while cumulative <= rank:
+                key = next(it)
+                cumulative += buckets[key]
+            value = self.min if key is None else _bucket_value(key)
+            results.append(min(max(value, self.min), self.max))
+
+        result = tuple(results)
+        self._percentiles = (count, fractions, result)
+        return result
+
+    def report_summary(self) -> dict[str, float]:
+        """Summary fields in the layout used by the JSON report."""
+        p50, p75, p90, p95, p99 = self.percentiles(_PCT_FRACS)
+        summary = {
+            "count": self.estimated_count,
+            "min": self.min,
+            "max": self.max,
+            "avg": self.total / self.count,
+            "median": p50,
+            "p50": p50,
+            "p75": p75,
+            "p90": p90,
+            "p95": p95,
+            "p99": p99,
+            "std_dev": self.std_dev,
+        }
+        if self.sample_rate < 1.0:
+            summary["sampled_count"] = self.count
+            summary["sample_rate"] = self.sample_rate
+        return summary
+
+    def rows(self, tag_keys: list[str]) -> Iterator[tuple]:
+        """Yield CSV rows (name, value, timestamp, *tags), oldest point first."""
+        size = self.size
+        values = self.values[:size]
+        timestamps = self.timestamps[:size]
+        name = self.name
+        tags = self.tags
+        no_tags = ("",) * len(tag_keys)
+        start = self._next
+        for idx in chain(range(start, size), range(start)):
+            if (point_tags := tags.get(idx)) is None:
+                yield (name, values[idx], timestamps[idx], *no_tags)
+            else:
+                yield (
+                    name,
+                    values[idx],
+                    timestamps[idx],
+                    *[point_tags.get(key, "") for key in tag_keys],
+                )
+
+
+class _CoarseClock:
+    """
+    Wall clock refreshed by a daemon thread every ``resolution`` seconds,
+    so stamping a point is an attribute read rather than a clock call.
+    """
+
+    def __init__(self, resolution: float = 0.01):
+        self.resolution = resolution
+        self.now = time.time()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._run, name="metrics-clock", daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.resolution)
+            self.now = time.time()
+
+
+_CLOCK = _CoarseClock()
+
+
+class _HotColdCounter:
+    """
+    Counter map whose writers never take a lock.
+
+    Writers add to the hot shard. A reader flips the hot index and folds the
+    now-cold shard into the running totals, subtracting what it folded so
+    that an increment landing on the cold shard mid-fold is picked up the
+    next time that shard is folded rather than lost.
+    """
+
+    __slots__ = ("_shards", "_hot", "_totals")
+
+    def __init__(self):
+        self._shards: tuple[dict[str, int], dict[str, int]] = (
+            defaultdict(int),
+            defaultdict(int),
+        )
+        self._hot = 0
+        self._totals: dict[str, int] = {}
+
+    def add(self, key: str, amount: int = 1) -> None:
+        self._shards[self._hot][key] += amount
+
+    def collect(self) -> Mapping[str, int]:
+        """Fold pending increments and return a read-only view of the totals."""
+        cold = self._shards[self._hot]
+        self._hot ^= 1
+        totals = self._totals
+        for key, amount in list(cold.items()):
+            if amount:
+                totals[key] = totals.get(key, 0) + amount
+                cold[key] -= amount
+        return MappingProxyType(totals)
+
+    def clear(self) -> None:
+        for shard in self._shards:
+            shard.clear()
+        self._totals.clear()
+
+
 class MetricsCollector:
     """
     Collects and aggregates custom metrics for load testing.
-    Thread-safe implementation.
+
+    Recording is lock-free and relies on Locust's gevent model: every user
+    is a greenlet on one OS thread, and greenlets only switch on I/O. It is
+    not safe to record from several real OS threads, which can lose updates.
+    Readers take the lock only to fold the hot/cold counters.
     """
 
-    def __init__(self, export_dir: str | None = None):
-        self._metrics: dict[str, list[MetricPoint]] = defaultdict(list)
-        self._lock = threading.RLock()
+    def __init__(
+        self,
+        export_dir: str | None = None,
+        keep_points: bool = True,
+        precise_timestamps: bool = False,
+        max_points: int = 100_000,
+    ):
+        self._metrics: dict[str, _MetricSeries] = {}
+        # Raw points are only needed for CSV export, summaries use aggregates;
+        # at most ``max_points`` recent points are kept per metric
+        self._max_points = max_points if keep_points else 0
+        # Point timestamps only feed the CSV export, a 10ms clock is plenty
+        self._precise_timestamps = precise_timestamps
+        if not precise_timestamps:
+            _CLOCK.start()
+        self._lock = threading.Lock()
         self._export_dir = Path(export_dir) if export_dir else Path("./metrics_output")
         self._export_dir.mkdir(parents=True, exist_ok=True)
         self._start_time = time.time()
 
         # Counters
-        self._counters: dict[str, int] = defaultdict(int)
+        self._counters = _HotColdCounter()
+
+        # Cache hit and async query counters are bumped without the lock:
+        # Locust users are greenlets sharing one OS thread and only switch
+        # on I/O, so a single ``+= 1`` cannot interleave with another.
 
         # Cache hit tracking
         self._cache_hits: int = 0
         self._cache_misses: int = 0
 
         # Error tracking
-        self._errors: dict[str, int] = defaultdict(int)
+        self._errors = _HotColdCounter()
 
-        # Database query times by database
-        self._db_query_times: dict[str, list[float]] = defaultdict(list)
+        # Request counts by counter name, plus totals for the error rate
+        self._request_counts: dict[str, int] = {}
+        self._success_total: int = 0
+        self._failure_total: int = 0
 
         # Async query tracking
         self._async_queries_started: int = 0
         self._async_queries_completed: int = 0
-        self._async_query_times: list[float] = []
+
+        # Background JSON export currently being written, if any
+        self._export_job: AsyncResult | None = None
 
     def record(
-        self, name: str, value: float, tags: dict[str, str] | None = None
+        self, name: str, value: float, tags: Mapping[str, str] | None = None
     ) -> None:
-        """Record a metric value."""
-        point = MetricPoint(
-            name=name, value=value, timestamp=time.time(), tags=tags or {}
-        )
-        with self._lock:
-            self._metrics[name].append(point)
+        """
+        Record a metric value, ignoring inf/nan. Tags are stored as given,
+        not copied.
+        """
+        timestamp = time.time() if self._precise_timestamps else _CLOCK.now
+        series = self._metrics.get(name) or self._get_series(name)
+        series.append(value, timestamp, tags)
+
+    def register_metric(self, name: str, expected_count: int) -> None:
+        """
+        Preallocate raw point storage for a metric expected to receive about
+        ``expected_count`` points, so recording never has to grow it.
+        """
+        self._get_series(name).reserve(expected_count)
+
+    def _get_series(self, name: str) -> _MetricSeries:
+        """
+        Get or create the series for a metric without taking the lock.
+        Series creation goes through dict.setdefault and appends to array
+        columns, both single C-level operations under the GIL.
+        """
+        series = self._metrics.get(name)
+        if series is None:
+            series = self._metrics.setdefault(
+                name, _MetricSeries(name, self._max_points)
+            )
+        return series
+
+    def set_sample_rate(self, name: str, rate: float) -> None:
+        """
+        Mark a metric as sampled at ``rate``, so that its summary count is
+        scaled back up by ``1 / rate``.
+        """
+        self._get_series(name).sample_rate = rate
 
     def increment(self, name: str, amount: int = 1) -> None:
         """Increment a counter."""
-        with self._lock:
-            self._counters[name] += amount
+        self._counters.add(name, amount)
 
     def record_response_time(
         self, endpoint: str, response_time_ms: float, success: bool = True
     ) -> None:
         """Record API response time."""
-        metric_name = f"response_time.{endpoint}"
-        self.record(metric_name, response_time_ms, {"success": str(success)})
+        self.record(
+            _metric_name("response_time", endpoint),
+            response_time_ms,
+            _SUCCESS_TAGS[bool(success)],
+        )
 
+        counts = self._request_counts
         if success:
-            self.increment(f"requests.success.{endpoint}")
+            self._success_total += 1
+            key = _metric_name("requests.success", endpoint)
         else:
-            self.increment(f"requests.failure.{endpoint}")
+            self._failure_total += 1
+            key = _metric_name("requests.failure", endpoint)
+        counts[key] = counts.get(key, 0) + 1
 
     def record_cache_hit(self, hit: bool = True) -> None:
         """Record cache hit or miss."""
-        with self._lock:
-            if hit:
-                self._cache_hits += 1
-            else:
-                self._cache_misses += 1
+        if hit:
+            self._cache_hits += 1
+        else:
+            self._cache_misses += 1
 
     def record_db_query_time(self, database: str, query_time_ms: float) -> None:
         """Record database query execution time."""
-        with self._lock:
-            self._db_query_times[database].append(query_time_ms)
-        self.record(f"db_query_time.{database}", query_time_ms)
+        self.record(_metric_name("db_query_time", database), query_time_ms)
+
+    def record_db_query_times(self, database: str, query_times_ms: list[float]) -> None:
+        """Record a batch of database query execution times."""
+        series = self._get_series(_metric_name("db_query_time", database))
+        series.extend(
+            query_times_ms, time.time() if self._precise_timestamps else _CLOCK.now
+        )
 
     def record_async_query_start(self) -> None:
         """Record async query start."""
-        with self._lock:
-            self._async_queries_started += 1
+        self._async_queries_started += 1
 
     def record_async_query_complete(self, total_time_ms: float) -> None:
         """Record async query completion."""
-        with self._lock:
-            self._async_queries_completed += 1
-            self._async_query_times.append(total_time_ms)
+        self._async_queries_completed += 1
         self.record("async_query_time", total_time_ms)
 
     def record_error(self, error_type: str, endpoint: str | None = None) -> None:
         """Record an error occurrence."""
-        with self._lock:
-            key = f"{error_type}:{endpoint}" if endpoint else error_type
-            self._errors[key] += 1
+        key = f"{error_type}:{endpoint}" if endpoint else error_type
+        self._errors.add(key)
 
     def get_cache_hit_ratio(self) -> float:
         """Get cache hit ratio."""
-        with self._lock:
-            total = self._cache_hits + self._cache_misses
-            if total == 0:
-                return 0.0
-            return self._cache_hits / total
+        hits = self._cache_hits
+        total = hits + self._cache_misses
+        if total == 0:
+            return 0.0
+        return hits / total
 
     def get_summary(self, name: str) -> MetricSummary | None:
         """Get summary statistics for a metric."""
-        with self._lock:
-            points = self._metrics.get(name, [])
-
-        if not points:
+        series = self._metrics.get(name)
+        if series is None or not series.count:
             return None
 
-        values = sorted([p.value for p in points])
-        count = len(values)
-
-        def percentile(data: list[float], p: float) -> float:
-            idx = int(len(data) * p)
-            return data[min(idx, len(data) - 1)]
-
+        p50, p75, p90, p95, p99 = series.percentiles(_PCT_FRACS)
         return MetricSummary(
             name=name,
-            count=count,
-            total=sum(values),
-            min_val=min(values),
-            max_val=max(values),
-            avg=mean(values),
-            median=median(values),
-            p50=percentile(values, 0.50),
-            p75=percentile(values, 0.75),
-            p90=percentile(values, 0.90),
-            p95=percentile(values, 0.95),
-            p99=percentile(values, 0.99),
-            std_dev=stdev(values) if count > 1 else 0.0,
+            count=series.estimated_count,
+            total=series.total / series.sample_rate,
+            min_val=series.min,
+            max_val=series.max,
+            avg=series.total / series.count,
+            median=p50,
+            p50=p50,
+            p75=p75,
+            p90=p90,
+            p95=p95,
+            p99=p99,
+            std_dev=series.std_dev,
         )
 
     def get_all_summaries(self) -> dict[str, MetricSummary]:
         """Get summaries for all metrics."""
-        with self._lock:
-            metric_names = list(self._metrics.keys())
+        metric_names = list(self._metrics)
 
         summaries = {}
         for name in metric_names:
@@ -205,15 +592,16 @@ class MetricsCollector:
 
         return summaries
 
-    def get_counters(self) -> dict[str, int]:
-        """Get all counter values."""
+    def get_counters(self) -> Mapping[str, int]:
+        """Get a read-only view of all counter values."""
         with self._lock:
-            return dict(self._counters)
+            counters = self._counters.collect()
+        return MappingProxyType({**counters, **self._request_counts})
 
-    def get_errors(self) -> dict[str, int]:
-        """Get all error counts."""
+    def get_errors(self) -> Mapping[str, int]:
+        """Get a read-only view of all error counts."""
         with self._lock:
-            return dict(self._errors)
+            return self._errors.collect()
 
     def get_throughput(self) -> dict[str, float]:
         """Calculate throughput (requests per second) for each endpoint."""
@@ -221,42 +609,33 @@ class MetricsCollector:
         if elapsed_seconds == 0:
             return {}
 
-        counters = self.get_counters()
-        throughput = {}
-
-        for key, count in counters.items():
-            if key.startswith("requests."):
-                throughput[key] = count / elapsed_seconds
-
-        return throughput
+        return {
+            key: count / elapsed_seconds
+            for key, count in list(self._request_counts.items())
+        }
 
     def get_error_rate(self) -> float:
         """Calculate overall error rate."""
-        counters = self.get_counters()
-
-        total_success = sum(
-            v for k, v in counters.items() if k.startswith("requests.success")
-        )
-        total_failure = sum(
-            v for k, v in counters.items() if k.startswith("requests.failure")
-        )
-
-        total = total_success + total_failure
+        failures = self._failure_total
+        total = self._success_total + failures
         if total == 0:
             return 0.0
 
-        return total_failure / total
+        return failures / total
 
     def get_report(self) -> dict[str, Any]:
         """Generate comprehensive metrics report."""
         elapsed = time.time() - self._start_time
 
+        async_times = self._metrics.get("async_query_time")
+
         report = {
             "timestamp": datetime.now().isoformat(),
             "duration_seconds": elapsed,
             "summaries": {},
-            "counters": self.get_counters(),
-            "errors": self.get_errors(),
+            # The report is a snapshot, so the live views are copied once here
+            "counters": dict(self.get_counters()),
+            "errors": dict(self.get_errors()),
             "throughput": self.get_throughput(),
             "error_rate": self.get_error_rate(),
             "cache": {
@@ -268,56 +647,87 @@ class MetricsCollector:
                 "started": self._async_queries_started,
                 "completed": self._async_queries_completed,
                 "avg_time_ms": (
-                    mean(self._async_query_times) if self._async_query_times else 0
+                    async_times.total / async_times.count
+                    if async_times is not None and async_times.count
+                    else 0
                 ),
             },
             "database_queries": {},
         }
 
-        # Add metric summaries
-        for name, summary in self.get_all_summaries().items():
-            report["summaries"][name] = {  # type: ignore[index]
-                "count": summary.count,
-                "min": summary.min_val,
-                "max": summary.max_val,
-                "avg": summary.avg,
-                "median": summary.median,
-                "p50": summary.p50,
-                "p75": summary.p75,
-                "p90": summary.p90,
-                "p95": summary.p95,
-                "p99": summary.p99,
-                "std_dev": summary.std_dev,
-            }
-
-        # Add database query stats
-        with self._lock:
-            for db, times in self._db_query_times.items():
-                if times:
-                    report["database_queries"][db] = {  # type: ignore[index]
-                        "count": len(times),
-                        "avg_ms": mean(times),
-                        "max_ms": max(times),
-                        "min_ms": min(times),
-                    }
+        # Add metric summaries straight from the series aggregates
+        report["summaries"] = {
+            name: series.report_summary()
+            for name, series in list(self._metrics.items())
+            if series.count
+        }
+
+        # Add database query stats from the db_query_time.<db> series
+        for name, series in list(self._metrics.items()):
+            if series.count and name.startswith("db_query_time."):
+                db = name.removeprefix("db_query_time.")
+                report["database_queries"][db] = {  # type: ignore[index]
+                    "count": series.count,
+                    "avg_ms": series.total / series.count,
+                    "max_ms": series.max,
+                    "min_ms": series.min,
+                }
 
         return report
 
-    def export_to_json(self, filename: str | None = None) -> str:
-        """Export metrics to JSON file."""
+    def _json_path(self, filename: str | None) -> Path:
         if filename is None:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"metrics_{timestamp}.json"
+        return self._export_dir / filename
 
-        filepath = self._export_dir / filename
-        report = self.get_report()
+    @staticmethod
+    def _write_json(report: dict[str, Any], filepath: Path) -> None:
+        if orjson is not None:
+            with open(filepath, "wb") as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2, default=str))
+        else:
+            with open(filepath, "w") as f:
+                json.dump(report, f, indent=2, default=str)
 
-        with open(filepath, "w") as f:
-            json.dump(report, f, indent=2, default=str)
+    def export_to_json(self, filename: str | None = None) -> str:
+        """Export metrics to JSON file."""
+        filepath = self._json_path(filename)
+        self._write_json(self.get_report(), filepath)
 
         logger.info(f"Metrics exported to {filepath}")
         return str(filepath)
 
+    def schedule_export(self, filename: str | None = None) -> bool:
+        """
+        Write a report snapshot to a JSON file in the background.
+
+        Serialization and file I/O run on a real OS thread from gevent's
+        pool, since Locust monkey-patches ``threading`` and a patched thread
+        would still run on the hub. Returns False, skipping this export,
+        while the previous one is still being written.
+        """
+        job = self._export_job
+        if job is not None and not job.ready():
+            return False
+
+        self._export_job = gevent.get_hub().threadpool.spawn(
+            self._export_json, self.get_report(), self._json_path(filename)
+        )
+        return True
+
+    def wait_for_exports(self) -> None:
+        """Wait until the scheduled export, if any, has been written."""
+        if self._export_job is not None:
+            self._export_job.wait()
+
+    def _export_json(self, report: dict[str, Any], filepath: Path) -> None:
+        try:
+            self._write_json(report, filepath)
+            logger.debug(f"Metrics exported to {filepath}")
+        except Exception as e:
+            logger.error(f"Failed to export metrics: {e}")
+
     def export_to_csv(self, filename: str | None = None) -> str:
         """Export raw metrics to CSV file."""
         if filename is None:
@@ -326,33 +736,25 @@ class MetricsCollector:
 
         filepath = self._export_dir / filename
 
-        with self._lock:
-            all_points = []
-            for name, points in self._metrics.items():
-                for point in points:
-                    all_points.append(
-                        {
-                            "name": point.name,
-                            "value": point.value,
-                            "timestamp": point.timestamp,
-                            **point.tags,
-                        }
-                    )
-
-        if all_points:
-            # Get all unique tag keys
-            all_tags: set[str] = set()
-            for point in all_points:  # type: ignore[assignment]
-                all_tags.update(point.keys())  # type: ignore[union-attr]
-
-            fieldnames = ["name", "value", "timestamp"] + sorted(
-                all_tags - {"name", "value", "timestamp"}
+        series_list = [series for series in list(self._metrics.values()) if series.size]
+
+        if series_list:
+            # Tags are sparse, so collecting their keys doesn't touch every point
+            tag_keys = sorted(
+                {
+                    key
+                    for series in series_list
+                    for tags in list(series.tags.values())
+                    for key in tags
+                }
+                - {"name", "value", "timestamp"}
             )
 
-            with open(filepath, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(all_points)
+            with open(filepath, "w", newline="", buffering=1 << 20) as f:
+                writer = csv.writer(f)
+                writer.writerow(["name", "value", "timestamp", *tag_keys])
+                for series in series_list:
+                    writer.writerows(series.rows(tag_keys))
 
         logger.info(f"Metrics exported to {filepath}")
         return str(filepath)
@@ -360,15 +762,17 @@ class MetricsCollector:
     def reset(self) -> None:
         """Reset all metrics."""
         with self._lock:
-            self._metrics.clear()
+            # Swap rather than clear, lock-free writers may hold old series
+            self._metrics = {}
             self._counters.clear()
             self._errors.clear()
+            self._request_counts.clear()
+            self._success_total = 0
+            self._failure_total = 0
             self._cache_hits = 0
             self._cache_misses = 0
-            self._db_query_times.clear()
             self._async_queries_started = 0
             self._async_queries_completed = 0
-            self._async_query_times.clear()
             self._start_time = time.time()
 
 
@@ -380,6 +784,10 @@ _collector_lock = threading.Lock()
 def get_metrics_collector() -> MetricsCollector:
     """Get or create global metrics collector."""
     global _global_collector
+    # Fast path without the lock once the collector exists
+    collector = _global_collector
+    if collector is not None:
+        return collector
     with _collector_lock:
         if _global_collector is None:
             _global_collector = MetricsCollector()
@@ -421,9 +829,13 @@ class MetricsTimer:
         metric_name: str,
         tags: dict[str, str] | None = None,
         collector: MetricsCollector | None = None,
+        sample_rate: float = 1.0,
     ):
         self.metric_name = metric_name
-        self.tags = tags or {}
+        self.sample_rate = sample_rate
+        # Points share one read-only tag mapping per label set and outcome,
+        # rather than each holding its own dict
+        self.labels = tuple(tags.items()) if tags else ()
         self.collector = collector or get_metrics_collector()
         self.start_time: float = 0
         self.duration_ms: float = 0
@@ -434,5 +846,29 @@ class MetricsTimer:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.duration_ms = (time.perf_counter() - self.start_time) * 1000
-        self.tags["success"] = str(exc_type is None)
-        self.collector.record(self.metric_name, self.duration_ms, self.tags)
+        self.collector.record(
+            self.metric_name,
+            self.duration_ms,
+            _timer_tags(self.labels, exc_type is None),
+        )
+        if self.sample_rate < 1.0:
+            self.collector.set_sample_rate(self.metric_name, self.sample_rate)
+
+
+_NULL_TIMER = nullcontext()
+
+
+def sampled_timer(
+    metric_name: str, tags: dict[str, str] | None = None, rate: float = 1.0
+) -> AbstractContextManager:
+    """
+    Time roughly ``rate`` of the calls with MetricsTimer, no-op for the rest.
+
+    The metric is marked with the sample rate, so summary counts are scaled
+    back up by ``1 / rate``.
+    """
+    if rate >= 1.0:
+        return MetricsTimer(metric_name, tags)
+    if random.random() >= rate:
+        return _NULL_TIMER
+    return MetricsTimer(metric_name, tags, sample_rate=rate)